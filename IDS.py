@@ -3,9 +3,42 @@ import random
 import numpy as np
 import argparse
 import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode()
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Generator (PCG64 + ziggurat) is much faster per Gaussian than the legacy
+# RandomState; fall back to the latter on NumPy < 1.17
+try:
+    _SEED_SEQ = np.random.SeedSequence()
+    _RNG = np.random.default_rng(_SEED_SEQ)
+except AttributeError:
+    _SEED_SEQ = None
+    _RNG = np.random.RandomState()
+
+# Below this many samples a single generator beats the thread fan-out
+_PARALLEL_MIN_SAMPLES = 1_000_000
+
+# Per-event configuration as parallel arrays of shape (E,), in events order
+EventTable = namedtuple(
+    "EventTable", ["names", "discrete", "mins", "maxs", "weights", "means", "std_devs"]
+)
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Email System IDS')
     parser.add_argument('events_file', help='Path to Events.txt')
@@ -19,20 +52,51 @@ def ensure_directories():
     Path("logs/monitoring").mkdir(parents=True, exist_ok=True)
     Path("analysis").mkdir(exist_ok=True)
 
+def _read_fields(f, field_count):
+    """Read the remaining ':'-separated lines of f as a (rows, fields) str array"""
+    rows = np.genfromtxt(
+        f, delimiter=":", usecols=range(field_count), autostrip=True,
+        comments=None, encoding="utf-8", dtype=str,
+    )
+    return rows.reshape(-1, field_count)
+
+def _require(rows, column, field):
+    """Return a column, raising ValueError if any row leaves it empty"""
+    values = rows[:, column]
+    if (values == "").any():
+        raise ValueError(f"Missing {field} value")
+    return values
+
+def _to_float(values, field, allow_empty=False):
+    """Convert a str column to float64; empty cells become NaN only if allowed"""
+    empty = values == ""
+    if empty.any() and not allow_empty:
+        raise ValueError(f"Missing {field} value")
+    floats = np.where(empty, "nan", values).astype(np.float64)
+    if np.isnan(floats[~empty]).any():
+        raise ValueError(f"Invalid {field} value: nan")
+    return floats
+
 def parse_events(file_path):
     """Parse Events.txt with error handling"""
     try:
         with open(file_path, 'r') as f:
-            lines = f.readlines()
-            event_count = int(lines[0].strip())
+            event_count = int(f.readline().strip())
+            rows = _read_fields(f, 5)
+            names = _require(rows, 0, "name")
+            types = _require(rows, 1, "type")
+            mins = _to_float(rows[:, 2], "min", allow_empty=True)
+            maxs = _to_float(rows[:, 3], "max", allow_empty=True)
+            weights = _require(rows, 4, "weight").astype(np.int64)
             events = {}
-            for line in lines[1:]:
-                name, event_type, min_val, max_val, weight = line.strip().split(":")[:5]
+            for name, event_type, min_val, max_val, weight in zip(
+                names.tolist(), types.tolist(), mins.tolist(), maxs.tolist(), weights.tolist()
+            ):
                 events[name] = {
                     "type": event_type,
-                    "min": float(min_val) if min_val else None,
-                    "max": float(max_val) if max_val else None,
-                    "weight": int(weight)
+                    "min": None if np.isnan(min_val) else min_val,
+                    "max": None if np.isnan(max_val) else max_val,
+                    "weight": weight
                 }
             if len(events) != event_count:
                 print(f"Warning: Expected {event_count} events but found {len(events)}")
@@ -45,14 +109,16 @@ def parse_stats(file_path):
     """Parse Stats.txt with error handling"""
     try:
         with open(file_path, 'r') as f:
-            lines = f.readlines()
-            event_count = int(lines[0].strip())
+            event_count = int(f.readline().strip())
+            rows = _read_fields(f, 3)
+            names = _require(rows, 0, "name")
+            means = _to_float(rows[:, 1], "mean")
+            std_devs = _to_float(rows[:, 2], "std_dev")
             stats = {}
-            for line in lines[1:]:
-                name, mean, std_dev = line.strip().split(":")[:3]
+            for name, mean, std_dev in zip(names.tolist(), means.tolist(), std_devs.tolist()):
                 stats[name] = {
-                    "mean": float(mean),
-                    "std_dev": float(std_dev)
+                    "mean": mean,
+                    "std_dev": std_dev
                 }
             if len(stats) != event_count:
                 print(f"Warning: Expected {event_count} events but found {len(stats)}")
@@ -72,89 +138,148 @@ def validate_configuration(events, stats):
         if event_data["type"] == "D" and not (isinstance(stat_data["mean"], (int, float))):
             print(f"Warning: Discrete event {event_name} has non-integer mean")
 
-def write_daily_log(day, events, phase="baseline"):
-    """Write daily events to log file"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_path = f"logs/{phase}/day_{day}_{timestamp}.json"
-    with open(log_path, 'w') as f:
-        json.dump(events, f, indent=2)
+def compile_config(events, stats):
+    """Compile events and stats into an EventTable; open bounds become +/-inf"""
+    names = tuple(events)
+    std_devs = np.array([stats[name]["std_dev"] for name in names], dtype=np.float64)
+    invalid = ~(np.isfinite(std_devs) & (std_devs >= 0))
+    if invalid.any():
+        bad = ", ".join(np.array(names, dtype=object)[invalid])
+        raise ValueError(f"std_dev must be non-negative and finite for: {bad}")
+    discrete = np.array([events[name]["type"] == "D" for name in names], dtype=bool)
+    mins = np.array([events[name]["min"] if events[name]["min"] is not None else -np.inf for name in names])
+    maxs = np.array([events[name]["max"] if events[name]["max"] is not None else np.inf for name in names])
+    # Discrete events are clamped against integer bounds (trunc leaves inf as is)
+    return EventTable(
+        names=names,
+        discrete=discrete,
+        mins=np.where(discrete, np.trunc(mins), mins),
+        maxs=np.where(discrete, np.trunc(maxs), maxs),
+        weights=np.array([events[name]["weight"] for name in names], dtype=np.float64),
+        means=np.array([stats[name]["mean"] for name in names], dtype=np.float64),
+        std_devs=std_devs,
+    )
+
+def write_phase_log(samples, table, phase, timestamp):
+    """Write a phase's (days, events) samples as .npy with a JSON sidecar"""
+    log_path = f"logs/{phase}/phase_{timestamp}.npy"
+    np.save(log_path, samples)
+    with open(f"logs/{phase}/phase_{timestamp}.json", 'wb') as f:
+        f.write(_dumps({
+            "events": list(table.names),
+            "discrete": table.discrete.tolist(),
+            "days": samples.shape[0]
+        }))
     return log_path
 
 def write_analysis_results(stats, filename):
     """Write analysis results to file"""
     filepath = f"analysis/{filename}"
-    with open(filepath, 'w') as f:
-        json.dump(stats, f, indent=2)
+    with open(filepath, 'wb') as f:
+        f.write(_dumps(stats))
     return filepath
 
-def generate_daily_events(events, stats, days=1, phase="baseline"):
-    """Generate daily events with progress feedback"""
-    log_data = []
+def draw_standard_normal(days, event_count):
+    """Draw a (days, events) standard normal matrix, split across threads if large"""
+    workers = os.cpu_count() or 1
+    if _SEED_SEQ is None or workers < 2 or days * event_count < _PARALLEL_MIN_SAMPLES:
+        return _RNG.standard_normal((days, event_count))
+
+    # Each thread fills its own slab from an independent child generator;
+    # Generator releases the GIL while filling, so the slabs run in parallel
+    samples = np.empty((days, event_count))
+    bounds = np.linspace(0, days, workers + 1).astype(int)
+    generators = [np.random.default_rng(seed) for seed in _SEED_SEQ.spawn(workers)]
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(
+            lambda i: generators[i].standard_normal(out=samples[bounds[i]:bounds[i + 1]]),
+            range(workers),
+        ))
+    return samples
+
+def generate_daily_events(table, days=1, phase="baseline"):
+    """Generate a (days, events) sample matrix and log it for the phase"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     print(f"\nGenerating events for {days} days ({phase} phase)...")
-    
-    for day in range(days):
-        if day % 5 == 0 or day == days - 1:
-            print(f"Progress: {day + 1}/{days} days processed")
-            
-        daily_events = {}
-        for event, params in events.items():
-            if params["type"] == "D":  # Discrete event
-                daily_value = int(np.random.normal(stats[event]["mean"], stats[event]["std_dev"]))
-                if params["min"] is not None:
-                    daily_value = max(daily_value, int(params["min"]))
-                if params["max"] is not None:
-                    daily_value = min(daily_value, int(params["max"]))
-            else:  # Continuous event
-                daily_value = round(np.random.normal(stats[event]["mean"], stats[event]["std_dev"]), 2)
-                if params["min"] is not None:
-                    daily_value = max(daily_value, params["min"])
-                if params["max"] is not None:
-                    daily_value = min(daily_value, params["max"])
-            daily_events[event] = daily_value
-            
-        log_path = write_daily_log(day + 1, daily_events, phase)
-        log_data.append(daily_events)
-        
-    return log_data
 
-def calculate_statistics(log_data):
-    """Calculate statistics from log data"""
+    # Draw every day for every event in one call, truncate discrete events,
+    # then clamp everything with one branchless clip
+    discrete = table.discrete
+    samples = draw_standard_normal(days, len(table.names))
+    samples *= table.std_devs
+    samples += table.means
+    samples[:, discrete] = np.trunc(samples[:, discrete])
+    np.clip(samples, table.mins, table.maxs, out=samples)
+
+    log_path = write_phase_log(samples, table, phase, timestamp)
+    print(f"Progress: {days}/{days} days processed, log written to {log_path}")
+    return samples
+
+def calculate_statistics(log_data, names):
+    """Calculate statistics from a (days, events) sample matrix"""
+    means = log_data.mean(axis=0)
+    std_devs = log_data.std(axis=0)
+
     stats_summary = {}
-    for event in log_data[0].keys():
-        event_values = [day[event] for day in log_data]
-        mean_val = np.mean(event_values)
-        std_dev_val = np.std(event_values)
-        stats_summary[event] = {
+    for name, mean_val, std_dev_val in zip(names, means, std_devs):
+        stats_summary[name] = {
             "mean": float(mean_val),
             "std_dev": float(std_dev_val)
         }
     return stats_summary
 
-def detect_anomalies(baseline_stats, events, log_data):
-    """Detect anomalies in log data"""
-    threshold = 2 * sum(event["weight"] for event in events.values())
+if njit is not None:
+    # Explicit signature compiles at import; cache=True reuses it across runs
+    @njit("void(f8[:, :], f8[:], f8[:], f8[:], f8[:], f8[:, :])", cache=True)
+    def _anomaly_kernel(values, means, std_devs, weights, out_counters, out_deviations):
+        days, event_count = values.shape
+        for day in range(days):
+            counter = 0.0
+            for i in range(event_count):
+                deviation = abs(values[day, i] - means[i]) / std_devs[i] * weights[i]
+                out_deviations[day, i] = deviation
+                counter += deviation
+            out_counters[day] = counter
+
+def score_anomalies(values, means, std_devs, weights):
+    """Return weighted deviations per (day, event) and anomaly counter per day"""
+    if njit is not None:
+        deviations = np.empty_like(values)
+        counters = np.empty(values.shape[0])
+        _anomaly_kernel(values, means, std_devs, weights, counters, deviations)
+        return deviations, counters
+    # Chain the ops through one buffer so no (days, events) temporaries are made
+    deviations = np.empty_like(values)
+    np.subtract(values, means, out=deviations)
+    np.abs(deviations, out=deviations)
+    np.divide(deviations, std_devs, out=deviations)
+    np.multiply(deviations, weights, out=deviations)
+    return deviations, deviations.sum(axis=1)
+
+def detect_anomalies(baseline_table, log_data):
+    """Detect anomalies in log data against a baseline EventTable"""
+    names = baseline_table.names
+    threshold = 2 * int(baseline_table.weights.sum())
     alerts = []
 
     print(f"\nAnomaly detection threshold: {threshold:.2f}")
-    
-    for day, data in enumerate(log_data, 1):
-        anomaly_counter = 0
-        daily_deviations = {}
-        
-        for event, value in data.items():
-            deviation = abs(value - baseline_stats[event]["mean"]) / baseline_stats[event]["std_dev"]
-            weighted_deviation = deviation * events[event]["weight"]
-            anomaly_counter += weighted_deviation
-            daily_deviations[event] = weighted_deviation
 
-        is_alert = anomaly_counter >= threshold
+    # Score every day at once: weighted deviation per (day, event) cell
+    deviations, counters = score_anomalies(
+        log_data, baseline_table.means, baseline_table.std_devs, baseline_table.weights
+    )
+    is_alert = counters >= threshold
+
+    # Convert to Python scalars once, outside the per-day loop
+    rows = zip(counters.tolist(), is_alert.tolist(), deviations.tolist())
+    for day, (counter, alert, daily_deviations) in enumerate(rows, 1):
         alert_data = {
             "day": day,
-            "anomaly_counter": round(anomaly_counter, 2),
+            "anomaly_counter": round(counter, 2),
             "threshold": threshold,
-            "alert": is_alert,
-            "status": "ALERT" if is_alert else "OK",
-            "deviations": daily_deviations
+            "alert": alert,
+            "status": "ALERT" if alert else "OK",
+            "deviations": dict(zip(names, daily_deviations))
         }
         alerts.append(alert_data)
         
@@ -163,14 +288,26 @@ def detect_anomalies(baseline_stats, events, log_data):
 def run_baseline_phase(events, stats, days):
     """Run baseline data collection phase"""
     print("\nStarting baseline phase...")
-    baseline_data = generate_daily_events(events, stats, days, "baseline")
-    baseline_stats = calculate_statistics(baseline_data)
+    table = compile_config(events, stats)
+    baseline_data = generate_daily_events(table, days, "baseline")
+    baseline_stats = calculate_statistics(baseline_data, table.names)
     stats_file = write_analysis_results(baseline_stats, "baseline_stats.json")
     print(f"Baseline statistics written to {stats_file}")
     return baseline_stats
 
 def run_monitoring_phase(events, baseline_stats, days):
     """Run monitoring phase"""
+    baseline_table = compile_config(events, baseline_stats)
+
+    # A zero baseline std_dev has no defined deviation score; fail before prompting
+    zero = baseline_table.std_devs == 0
+    if zero.any():
+        bad = ", ".join(np.array(baseline_table.names, dtype=object)[zero])
+        raise ValueError(
+            f"Baseline std_dev must be positive for: {bad}. "
+            "Rerun the baseline over more days."
+        )
+
     while True:
         try:
             stats_file = input("\nEnter path to new statistics file (or 'quit' to exit): ")
@@ -181,8 +318,8 @@ def run_monitoring_phase(events, baseline_stats, days):
             validate_configuration(events, new_stats)
             
             print("\nStarting monitoring phase...")
-            live_data = generate_daily_events(events, new_stats, days, "monitoring")
-            alerts = detect_anomalies(baseline_stats, events, live_data)
+            live_data = generate_daily_events(compile_config(events, new_stats), days, "monitoring")
+            alerts = detect_anomalies(baseline_table, live_data)
             
             # Write alerts to file and display results
             alert_file = write_analysis_results(alerts, f"alerts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")